@@ -1,17 +1,22 @@
 import os
 import argparse
+import shutil
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 
 # Directories to exclude anywhere in the path
 EXCLUDED_DIRS = {".git", ".idea", ".terraform"}
 
+# Files above this size are streamed straight into the output in chunks
+# instead of being read into memory by the reader threads
+LARGE_FILE_THRESHOLD = 1 << 20
 
-def has_excluded_dir(path_str: str, excluded_dirs: set) -> bool:
-    """
-    Returns True if any component of path_str matches
-    one of the excluded_dirs.
-    """
-    parts = os.path.abspath(path_str).split(os.sep)
-    return any(part == ex for part in parts for ex in excluded_dirs)
+# Precomputed output framing, kept as bytes so the write loop does no
+# per-file string building beyond encoding the two path fields
+SEP = ("-" * 60 + "\n").encode('utf-8')
+HDR = b"File Path = %s\nFile Name = %s\n\n"
 
 
 def parse_arguments():
@@ -38,130 +43,295 @@ def parse_arguments():
     return parser.parse_args()
 
 
-def search_files(base_path, file_types, exclude_files):
+def _iter_dirs(base_path):
+    """
+    Yields (dir_path, subdir_names, file_names) for base_path and every
+    subdirectory, top-down. Mutating subdir_names in place prunes the
+    corresponding subtrees, like os.walk.
+
+    On POSIX with Python 3.12+ this uses os.fwalk, whose fd-relative descent
+    lets the kernel resolve each directory in O(1) instead of re-walking the
+    full path from the root, which matters on deeply nested trees. fwalk was
+    recursive before 3.12 and would hit the recursion limit on exactly those
+    trees, so older interpreters (and platforms without fwalk) use the
+    iterative os.scandir stack instead, which still gets is_dir/is_file from
+    the cached d_type without a stat() per entry.
     """
-    Recursively searches for files matching the given types in the specified path.
+    if sys.version_info >= (3, 12) and hasattr(os, "fwalk"):
+        walker = os.fwalk(base_path)
+        while True:
+            # fwalk opens base_path eagerly and raises on a missing or
+            # unreadable root; swallow that like os.walk (and the scandir
+            # branch below), which simply yield nothing
+            try:
+                dir_path, subdirs, files, _ = next(walker)
+            except (OSError, StopIteration):
+                return
+            yield dir_path, subdirs, files
+
+    pending = deque([base_path])
+    while pending:
+        current_dir = pending.popleft()
+        subdirs = []
+        files = []
+        symlinked = set()
+        try:
+            with os.scandir(current_dir) as scan:
+                for entry in scan:
+                    # Classify like os.walk/os.fwalk: symlinks to
+                    # directories are listed in subdirs (but never
+                    # descended into), everything else goes into files
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        subdirs.append(entry.name)
+                        if entry.is_symlink():
+                            symlinked.add(entry.name)
+                    else:
+                        files.append(entry.name)
+        except OSError:
+            # Mirror os.walk's default behaviour of skipping unreadable dirs
+            continue
+        yield current_dir, subdirs, files
+        prefix = current_dir if current_dir.endswith(os.sep) else current_dir + os.sep
+        pending.extend(prefix + name for name in subdirs if name not in symlinked)
+
+
+def scan_project(base_path, file_types, exclude_files):
+    """
+    Walks base_path once, collecting files matching the given types and
+    recording the directory structure as it goes, so the tree rendering
+    never has to touch the filesystem a second time.
 
     Args:
-        base_path (str): Directory path to search in.
+        base_path (str): Absolute directory path to search in.
         file_types (list of str): List of file extensions or file names to match.
-        exclude_files (list of str): List of files to exclude from the results.
+        exclude_files (frozenset of str): Absolute paths of files to exclude.
 
     Returns:
-        list of lists: A list where each element is a list containing files of a certain type.
+        tuple: (files_by_type, tree) where files_by_type is a list per type of
+        matching file paths in traversal order (callers that need a
+        deterministic order sort the lists themselves), and tree is a flat
+        list of nodes. Each node is a list of (name, child_idx) children
+        sorted by name, with child_idx pointing at the subdirectory's node,
+        or None for a matched file. Node 0 is base_path itself.
     """
     files_by_type = [[] for _ in file_types]
 
-    for root, _, files in os.walk(base_path):
-        # Skip the entire directory if it's under an excluded path
-        if has_excluded_dir(root, EXCLUDED_DIRS):
-            continue
-
+    # Match on the extension first, then fall back to the full file name,
+    # turning the per-file check for most types into two dict lookups
+    ext_to_idx = {file_type: i for i, file_type in enumerate(file_types)}
+    name_to_idx = {file_type: i for i, file_type in enumerate(file_types)}
+    # Dotted types like init.sql cannot be resolved from the last path
+    # component alone, so they keep the endswith suffix check
+    dotted_types = tuple((".%s" % file_type, i)
+                         for i, file_type in enumerate(file_types)
+                         if "." in file_type)
+
+    tree = [[]]
+    node_idx_by_path = {base_path: 0}
+    for dir_path, subdirs, files in _iter_dirs(base_path):
+        children = tree[node_idx_by_path.pop(dir_path)]
+        # Prune excluded directories by name; nothing below them is ever
+        # visited. Sorting here also fixes the descent order.
+        subdirs[:] = sorted(name for name in subdirs if name not in EXCLUDED_DIRS)
+        prefix = dir_path if dir_path.endswith(os.sep) else dir_path + os.sep
+
+        entries = [(name, True) for name in subdirs]
         for file in files:
-            file_path = os.path.join(root, file)
-            # Skip excluded files or paths containing excluded dirs
-            if file_path in exclude_files or has_excluded_dir(file_path, EXCLUDED_DIRS):
+            # Filenames alone decide the match; the full path is only built
+            # for files that are actually kept
+            i = ext_to_idx.get(file.rpartition(".")[2])
+            if i is None:
+                i = name_to_idx.get(file)
+            if i is None:
+                for suffix, j in dotted_types:
+                    if file.endswith(suffix):
+                        i = j
+                        break
+            if i is None:
                 continue
+            file_path = prefix + file
+            if file_path in exclude_files:
+                continue
+            files_by_type[i].append(file_path)
+            entries.append((file, False))
+        entries.sort()
+
+        for name, is_dir in entries:
+            if is_dir:
+                child_idx = len(tree)
+                tree.append([])
+                node_idx_by_path[prefix + name] = child_idx
+                children.append((name, child_idx))
+            else:
+                children.append((name, None))
 
-            for i, file_type in enumerate(file_types):
-                # Match if file ends with .<file_type> or equals <file_type>
-                if file.endswith(f".{file_type}") or file == file_type:
-                    files_by_type[i].append(file_path)
+    return files_by_type, tree
 
-    # Sort each list to maintain a consistent order
-    for file_list in files_by_type:
-        file_list.sort()
 
-    return files_by_type
+def _copy_file_contents(in_file, out_file):
+    """
+    Copies the whole of in_file into out_file. Where os.sendfile exists the
+    bytes move kernel-to-kernel without touring a userspace buffer; other
+    platforms (or filesystems that refuse sendfile) fall back to chunked
+    copying.
+    """
+    if hasattr(os, 'sendfile'):
+        # Buffered header bytes must land before the kernel-level copy
+        out_file.flush()
+        offset = 0
+        size = os.fstat(in_file.fileno()).st_size
+        try:
+            while offset < size:
+                sent = os.sendfile(out_file.fileno(), in_file.fileno(),
+                                   offset, size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+            return
+        except OSError:
+            # Only fall back if nothing was copied yet; a partial sendfile
+            # followed by a restarted copy would duplicate data
+            if offset:
+                raise
+    shutil.copyfileobj(in_file, out_file, length=1 << 16)
+
+
+def _read_file(file_path):
+    """
+    Reads a single file as bytes, returning (file_path, content, error).
+
+    Files above LARGE_FILE_THRESHOLD return content=None and error=None;
+    they are streamed into the output in chunks when written rather than
+    materialized in memory here.
+    """
+    try:
+        if os.path.getsize(file_path) > LARGE_FILE_THRESHOLD:
+            return file_path, None, None
+        with open(file_path, 'rb') as in_file:
+            return file_path, in_file.read(), None
+    except Exception as e:
+        return file_path, None, e
 
 
 def create_aggregated_file(files_by_type, output_file):
     """
     Creates a new text file with the contents of all files in files_by_type.
 
+    Reads are dispatched to a thread pool so per-file open/read latency
+    overlaps across files; writes stay sequential to preserve output order.
+    Everything is handled as bytes, so UTF-8 content passes through without
+    a decode/encode round-trip.
+
     Args:
         files_by_type (list of lists): A list of lists of file paths to read.
         output_file (str): The path to the output text file.
     """
-    with open(output_file, 'w', encoding='utf-8') as out_file:
-        for file_list in files_by_type:
-            for file_path in file_list:
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as in_file:
-                        content = in_file.read()
-                        out_file.write("-" * 60 + "\n")
-                        out_file.write(f"File Path = {file_path}\n")
-                        out_file.write(f"File Name = {os.path.basename(file_path)}\n\n")
-                        out_file.write(content + "\n")
-                except Exception as e:
-                    out_file.write(f"Error reading {file_path}: {e}\n")
-
-
-def append_directory_structure(file_paths, base_path, output_file):
+    # Sort here (one pass per type) to keep the output deterministic; the
+    # scan hands the lists over in traversal order
+    path_iter = (file_path
+                 for file_list in files_by_type
+                 for file_path in sorted(file_list))
+    max_workers = min(32, (os.cpu_count() or 1) * 4)
+
+    # A large write buffer coalesces the many small header writes into
+    # roughly one write() syscall per MiB
+    with open(output_file, 'wb', buffering=1 << 20) as out_file:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            # Keep only a small window of reads in flight, so at most
+            # window file contents sit in memory at once rather than every
+            # result the pool manages to finish ahead of the writer
+            window = max_workers * 2
+            in_flight = deque(pool.submit(_read_file, file_path)
+                              for file_path in islice(path_iter, window))
+            while in_flight:
+                file_path, content, error = in_flight.popleft().result()
+                next_path = next(path_iter, None)
+                if next_path is not None:
+                    in_flight.append(pool.submit(_read_file, next_path))
+                if error is not None:
+                    out_file.write(f"Error reading {file_path}: {error}\n".encode('utf-8'))
+                    continue
+                out_file.write(SEP)
+                # Paths are built by the scan, so the name is simply
+                # everything after the last separator
+                out_file.write(HDR % (file_path.encode('utf-8'),
+                                      file_path.rpartition(os.sep)[2].encode('utf-8')))
+                if content is None:
+                    # Large file: stream it straight into the output
+                    try:
+                        with open(file_path, 'rb') as in_file:
+                            _copy_file_contents(in_file, out_file)
+                    except Exception as e:
+                        out_file.write(f"Error reading {file_path}: {e}\n".encode('utf-8'))
+                        continue
+                else:
+                    out_file.write(content)
+                out_file.write(b"\n")
+
+
+def append_directory_structure(tree, output_file):
     """
-    Appends the directory structure in a tree-like format to the output file,
-    including only the files in file_paths and skipping excluded directories.
+    Appends the directory structure recorded by scan_project to the output
+    file in a tree-like format.
 
     Args:
-        file_paths (list of str): List of file paths to include in the directory structure.
-        base_path (str): The base directory path to print the structure for.
+        tree (list of lists): Flat node list as returned by scan_project.
         output_file (str): The path to the output text file.
     """
-    file_paths_set = set(file_paths)
-
-    def walk_dir(path, prefix=""):
-        # Only show items that are:
-        #   1. In file_paths_set or are directories
-        #   2. NOT under an excluded directory path
-        contents = []
-        for name in os.listdir(path):
-            full_path = os.path.join(path, name)
-            if has_excluded_dir(full_path, EXCLUDED_DIRS):
-                continue
-            if full_path in file_paths_set or os.path.isdir(full_path):
-                contents.append(name)
+    # Render the recorded tree iteratively with an explicit stack so
+    # arbitrarily deep trees cannot hit the recursion limit. Each stack item
+    # is (node_idx, prefix, line): the entry's own rendered line, plus the
+    # node to expand (node_idx is None for files).
+    lines = []
+    stack = [(0, "", None)]
+    while stack:
+        node_idx, prefix, line = stack.pop()
+        if line is not None:
+            lines.append(line)
+        if node_idx is None:
+            continue
 
         # Create pointers for tree-like visualization
-        pointers = ["├── "] * (len(contents) - 1) + ["└── "] if contents else []
-        for pointer, name in zip(pointers, contents):
-            full_path = os.path.join(path, name)
-            with open(output_file, 'a', encoding='utf-8') as out_file:
-                out_file.write(f"{prefix}{pointer}{name}\n")
-            # Recurse into directories
-            if os.path.isdir(full_path):
-                extension = "│   " if pointer == "├── " else "    "
-                walk_dir(full_path, prefix=prefix + extension)
-
-    # Append a header
-    with open(output_file, 'a', encoding='utf-8') as out_file:
-        out_file.write("-" * 60 + "\n")
-        out_file.write("Directory Structure\n")
-
-    walk_dir(base_path)
+        node = tree[node_idx]
+        pointers = ["├── "] * (len(node) - 1) + ["└── "] if node else []
+        children = []
+        for pointer, (name, child_idx) in zip(pointers, node):
+            extension = "│   " if pointer == "├── " else "    "
+            children.append((child_idx, prefix + extension, f"{prefix}{pointer}{name}\n"))
+        # Push in reverse so entries are rendered in recorded order
+        stack.extend(reversed(children))
+    with open(output_file, 'ab', buffering=1 << 20) as out_file:
+        out_file.write(SEP)
+        out_file.write(b"Directory Structure\n")
+        out_file.write("".join(lines).encode('utf-8'))
 
 
 def main():
     args = parse_arguments()
 
-    directory = args.directory if args.directory else os.getcwd()
+    # Work with real (symlink-resolved) paths throughout so exclusion tests
+    # are plain string comparisons, with no per-file normalization in the
+    # hot loop and no way for a symlinked -o or -d to dodge them
+    directory = os.path.realpath(args.directory if args.directory else os.getcwd())
     file_types = args.types if args.types else ['py', 'txt', 'yml', 'Dockerfile', 'init.sql', 'README.md', 'tf']
     output_file = args.output if args.output else os.path.join(os.getcwd(), 'concatenated_project.txt')
 
     # Exclude the output file and the script file itself
-    script_file = os.path.abspath(__file__)
-    exclude_files = [output_file, script_file]
-
-    # 1) Search and filter out excluded files
-    files_by_type = search_files(directory, file_types, exclude_files=exclude_files)
+    script_file = os.path.realpath(__file__)
+    exclude_files = frozenset(os.path.realpath(p) for p in (output_file, script_file))
 
-    # 2) Flatten files_by_type to a single list
-    all_files = [f for file_list in files_by_type for f in file_list]
+    # 1) Single traversal: collect matching files and record the tree
+    files_by_type, tree = scan_project(directory, file_types, exclude_files=exclude_files)
 
-    # 3) Create the aggregated file from matching files
+    # 2) Create the aggregated file from matching files
     create_aggregated_file(files_by_type, output_file)
 
-    # 4) Append the directory structure, skipping excluded directories
-    append_directory_structure(all_files, directory, output_file)
+    # 3) Append the directory structure recorded during the scan
+    append_directory_structure(tree, output_file)
 
     print(f"Aggregated file created at {output_file}")
 